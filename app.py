@@ -1,31 +1,86 @@
 import streamlit as st
-import google.generativeai as genai
+import streamlit.components.v1 as components
 import os
+import copy
 from dotenv import load_dotenv
 import tempfile
 import json
 from datetime import datetime
 from moviepy.editor import VideoFileClip
-import time
 import cv2
 from PIL import Image
 import io
 import base64
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from docx import Document
 from docx.shared import Inches, Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
-import pickle
 import re
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
 
 # Load environment variables
 load_dotenv()
 
-# Configure Gemini API
-if 'GEMINI_API_KEY' in os.environ:
+# Gemini models offered in the sidebar: Flash is the faster, cheaper default and Pro is opt-in
+GEMINI_MODELS = {
+    'gemini-2.5-flash': 'Flash (faster)',
+    'gemini-2.5-pro': 'Pro (highest quality)',
+}
+# Set GEMINI_MODEL to change the default for a deployment (e.g. GEMINI_MODEL=gemini-2.5-pro)
+DEFAULT_GEMINI_MODEL = os.environ.get('GEMINI_MODEL', 'gemini-2.5-flash')
+
+# Configure Gemini API once per process; each model handle is reused across reruns and sessions
+@st.cache_resource
+def get_model(model_name=DEFAULT_GEMINI_MODEL):
+    """Configure Gemini and return a shared GenerativeModel handle"""
+    # Imported here so reruns that never reach Gemini don't pay for loading the SDK
+    import google.generativeai as genai
+    
     genai.configure(api_key=os.environ['GEMINI_API_KEY'])
-    model = genai.GenerativeModel('gemini-2.5-pro')
-else:
-    model = None
+    return genai.GenerativeModel(model_name)
+
+# Upper bound (seconds) on a server-suggested retry delay we are willing to wait out
+GEMINI_MAX_RETRY_DELAY = 60
+
+_gemini_backoff = wait_random_exponential(multiplier=1, max=30)
+
+def wait_for_gemini(retry_state):
+    """Back off with jitter, but not sooner than the RetryInfo delay a 429 may carry"""
+    delay = _gemini_backoff(retry_state)
+    error = retry_state.outcome.exception()
+    for detail in getattr(error, 'details', None) or []:
+        hint = getattr(detail, 'retry_delay', None)
+        if hint is not None:
+            delay = max(delay, min(hint.seconds + hint.nanos / 1e9, GEMINI_MAX_RETRY_DELAY))
+    return delay
+
+def is_retryable_gemini_error(error):
+    """True for rate-limit (429) and overload (503) errors"""
+    # Imported on first failure: google.api_core.exceptions pulls in grpc, which cold
+    # starts shouldn't pay for until a session actually talks to Gemini
+    from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable
+    
+    return isinstance(error, (ResourceExhausted, ServiceUnavailable))
+
+@retry(
+    wait=wait_for_gemini,
+    stop=stop_after_attempt(5),
+    retry=retry_if_exception(is_retryable_gemini_error),
+    reraise=True
+)
+def call_gemini(model, contents, **kwargs):
+    """Call Gemini, retrying rate-limit (429) and overload (503) errors with backoff"""
+    return model.generate_content(contents, **kwargs)
+
+# Longest side (px) of screenshots sent to Gemini; 768px fits in a single image tile
+GEMINI_IMAGE_MAX_SIDE = 768
+
+# Worker threads used to extract and encode frames (OpenCV also threads its own decoding)
+FRAME_EXTRACTION_WORKERS = min(4, os.cpu_count() or 1)
 
 # Page config
 # Prefer local favicon (swirl2.png). Streamlit page_icon accepts file path string or emoji.
@@ -51,28 +106,32 @@ APP_URL = "https://sop.mmautomates.com"  # Updated to custom domain
 THUMBNAIL_URL = "https://sop.mmautomates.com/swirl2.png"  # Updated to custom domain
 APP_DESCRIPTION = "AI Process Documentation Generator - Upload screen recordings → generate professional Standard Operating Procedures"
 
-st.markdown(f"""
+# st.markdown never executes <script> tags, so the tags are injected from a zero-height component
+META_TAGS_HTML = f"""
 <script>
 (function() {{
+    // Runs inside the component iframe, so tags go into the parent app document
+    const doc = window.parent.document;
+    
     // Function to add or update meta tag
     function addMetaTag(property, content) {{
-        let meta = document.querySelector(`meta[property="${{property}}"]`) || 
-                   document.querySelector(`meta[name="${{property}}"]`);
+        let meta = doc.querySelector(`meta[property="${{property}}"]`) || 
+                   doc.querySelector(`meta[name="${{property}}"]`);
         if (!meta) {{
-            meta = document.createElement('meta');
+            meta = doc.createElement('meta');
             if (property.startsWith('og:')) {{
                 meta.setAttribute('property', property);
             }} else {{
                 meta.setAttribute('name', property);
             }}
-            document.head.appendChild(meta);
+            doc.head.appendChild(meta);
         }}
         meta.setAttribute('content', content);
     }}
     
     // Add favicon link if it doesn't exist
     function addFavicon() {{
-        let link = document.querySelector('link[rel="icon"]') || document.querySelector('link[rel="shortcut icon"]');
+        let link = doc.querySelector('link[rel="icon"]') || doc.querySelector('link[rel="shortcut icon"]');
         if (!link) {{
             // Try multiple paths for favicon
             const faviconPaths = [
@@ -84,19 +143,19 @@ st.markdown(f"""
             
             // Try each path
             for (const path of faviconPaths) {{
-                link = document.createElement('link');
+                link = doc.createElement('link');
                 link.rel = 'icon';
                 link.type = 'image/png';
                 link.href = path;
-                document.head.appendChild(link);
+                doc.head.appendChild(link);
                 break; // Use first path
             }}
             
             // Also add as apple-touch-icon for better compatibility
-            let appleLink = document.createElement('link');
+            let appleLink = doc.createElement('link');
             appleLink.rel = 'apple-touch-icon';
             appleLink.href = '/static/favicon.png';
-            document.head.appendChild(appleLink);
+            doc.head.appendChild(appleLink);
         }}
     }}
     
@@ -120,11 +179,12 @@ st.markdown(f"""
     addMetaTag('description', '{APP_DESCRIPTION}');
 }})();
 </script>
-""", unsafe_allow_html=True)
+"""
+components.html(META_TAGS_HTML, height=0)
 
 # Custom CSS - Cache-busted with version timestamp
 CSS_VERSION = "v2024.01"  # Update this when CSS changes to force browser reload
-st.markdown("""
+APP_CSS = """
 <style id="app-css-""" + CSS_VERSION + """">
     :root {
         /* Accessible brand palette - WCAG AA compliant, based on config.toml */
@@ -300,30 +360,51 @@ st.markdown("""
     }
 
 </style>
-""", unsafe_allow_html=True)
+"""
+# Strip comments and collapse whitespace once, so each rerun ships a smaller payload
+APP_CSS = re.sub(r"\s+", " ", re.sub(r"/\*.*?\*/", "", APP_CSS, flags=re.S)).strip()
+
+def inject_css():
+    """Inject the app stylesheet.
+
+    Streamlit removes any element a rerun does not re-emit, so the styles are
+    written on every rerun rather than gated to once per session.
+    """
+    st.markdown(APP_CSS, unsafe_allow_html=True)
+
+# Session state keys and their initial values
+SESSION_DEFAULTS = {
+    'transcript': None,
+    'key_moments': None,
+    'video_path': None,
+    'audio_path': None,
+    'extracted_frames': None,
+    'word_doc_bytes': None,
+    'word_doc_created_at': None,
+    'editing_mode': False,
+    'google_creds': None,
+    'moments_to_delete': set(),
+    'viewing_image': None,
+}
+
+@st.cache_data
+def get_logo_html(logo_path):
+    """Build the logo link HTML with the image embedded as a base64 data URL"""
+    with open(logo_path, "rb") as img_file:
+        img_data = base64.b64encode(img_file.read()).decode()
+    return f"""
+    <div style="padding: 10px 0;">
+        <a href="https://mmautomates.com" target="_self" style="text-decoration: none; display: inline-block;">
+            <img src="data:image/png;base64,{img_data}" alt="MM Automates" style="height: 96px; width: 96px; object-fit: contain; cursor: pointer;">
+        </a>
+    </div>
+    """
 
 def initialize_session_state():
     """Initialize session state variables"""
-    if 'transcript' not in st.session_state:
-        st.session_state.transcript = None
-    if 'key_moments' not in st.session_state:
-        st.session_state.key_moments = None
-    if 'video_path' not in st.session_state:
-        st.session_state.video_path = None
-    if 'audio_path' not in st.session_state:
-        st.session_state.audio_path = None
-    if 'extracted_frames' not in st.session_state:
-        st.session_state.extracted_frames = None
-    if 'word_doc_bytes' not in st.session_state:
-        st.session_state.word_doc_bytes = None
-    if 'editing_mode' not in st.session_state:
-        st.session_state.editing_mode = False
-    if 'google_creds' not in st.session_state:
-        st.session_state.google_creds = None
-    if 'moments_to_delete' not in st.session_state:
-        st.session_state.moments_to_delete = set()
-    if 'viewing_image' not in st.session_state:
-        st.session_state.viewing_image = None
+    for key, value in SESSION_DEFAULTS.items():
+        # Copy so each session gets its own mutable defaults (e.g. the set) rather than a shared one
+        st.session_state.setdefault(key, copy.copy(value))
 
 def extract_audio_from_video(video_path):
     """Extract audio from video file"""
@@ -370,7 +451,7 @@ def extract_audio_from_video(video_path):
         st.error(f"Error extracting audio: {str(e)}")
         return None, None
 
-def transcribe_audio_with_gemini(audio_path):
+def transcribe_audio_with_gemini(model, audio_path):
     """Transcribe audio using Gemini API"""
     try:
         with st.spinner("🎤 Transcribing audio with AI... This may take a minute..."):
@@ -400,7 +481,7 @@ def transcribe_audio_with_gemini(audio_path):
             }
             
             # Generate content
-            response = model.generate_content([prompt, audio_part])
+            response = call_gemini(model, [prompt, audio_part])
             
             return response.text
             
@@ -410,7 +491,7 @@ def transcribe_audio_with_gemini(audio_path):
         st.error(f"Details: {traceback.format_exc()}")
         return None
 
-def analyze_transcript_for_key_moments(transcript):
+def analyze_transcript_for_key_moments(model, transcript):
     """Analyze transcript to identify key moments for screenshots"""
     try:
         with st.spinner("🧠 AI is analyzing the process to identify key moments..."):
@@ -447,7 +528,7 @@ def analyze_transcript_for_key_moments(transcript):
             {transcript}
             """
             
-            response = model.generate_content(prompt)
+            response = call_gemini(model, prompt)
             
             # Extract JSON from response
             response_text = response.text.strip()
@@ -497,71 +578,89 @@ def seconds_to_timestamp(seconds):
     return f"{mins}:{secs:02d}"
 
 def extract_frame_at_timestamp(video_path, timestamp_seconds):
-    """Extract a single frame from video at given timestamp"""
+    """Extract a single frame from video at given timestamp (errors propagate to the caller)"""
+    # Each call opens its own capture, so calls are safe to run on separate threads
+    cap = cv2.VideoCapture(video_path)
     try:
-        cap = cv2.VideoCapture(video_path)
-        
         # Set position to timestamp (in milliseconds)
         cap.set(cv2.CAP_PROP_POS_MSEC, timestamp_seconds * 1000)
         
         # Read frame
         success, frame = cap.read()
+    finally:
         cap.release()
-        
-        if success:
-            # Convert BGR to RGB
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            # Convert to PIL Image
-            img = Image.fromarray(frame_rgb)
-            return img
-        else:
-            return None
-            
-    except Exception as e:
-        st.error(f"Error extracting frame at {timestamp_seconds}s: {str(e)}")
+    
+    if success:
+        # Convert BGR to RGB
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        # Convert to PIL Image
+        img = Image.fromarray(frame_rgb)
+        return img
+    else:
         return None
 
+def extract_frame_data(video_path, moment):
+    """Extract and encode the frame for one key moment; runs on a worker thread, so no st calls"""
+    frame = extract_frame_at_timestamp(video_path, timestamp_to_seconds(moment['timestamp']))
+    if not frame:
+        return None
+    return {
+        'moment': moment,
+        # Only encoded bytes are kept in session state; the raw RGB frame (~6 MB at 1080p)
+        # is released. PNG for display and the Word export, downscaled JPEG for Gemini
+        'image_bytes': image_to_png_bytes(frame),
+        'gemini_bytes': image_to_gemini_jpeg(frame),
+        'timestamp': moment['timestamp']
+    }
+
 def extract_all_frames(video_path, key_moments):
     """Extract frames for all key moments"""
-    frames = []
+    results = [None] * len(key_moments)
     
     progress_bar = st.progress(0)
     status_text = st.empty()
     
-    for i, moment in enumerate(key_moments):
-        timestamp_seconds = timestamp_to_seconds(moment['timestamp'])
-        status_text.text(f"Extracting frame {i+1}/{len(key_moments)} at {moment['timestamp']}...")
-        
-        frame = extract_frame_at_timestamp(video_path, timestamp_seconds)
-        
-        if frame:
-            frames.append({
-                'moment': moment,
-                'image': frame,
-                'timestamp': moment['timestamp']
-            })
-        
-        progress_bar.progress((i + 1) / len(key_moments))
+    # OpenCV decoding and PIL encoding release the GIL, so frames are processed in parallel;
+    # progress and errors are reported from this (the script) thread as each one finishes
+    with ThreadPoolExecutor(max_workers=FRAME_EXTRACTION_WORKERS) as executor:
+        futures = {
+            executor.submit(extract_frame_data, video_path, moment): i
+            for i, moment in enumerate(key_moments)
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                st.error(f"Error extracting frame at {key_moments[i]['timestamp']}: {str(e)}")
+            
+            status_text.text(f"Extracted frame {done}/{len(key_moments)}...")
+            progress_bar.progress(done / len(key_moments))
     
     status_text.empty()
     progress_bar.empty()
     
-    return frames
+    # Keep chronological order; moments whose frame couldn't be read are skipped
+    return [frame_data for frame_data in results if frame_data]
 
-def image_to_base64(image):
-    """Convert PIL Image to base64 string"""
+def image_to_png_bytes(image):
+    """Encode PIL Image as PNG bytes"""
     buffered = io.BytesIO()
     image.save(buffered, format="PNG")
-    img_str = base64.b64encode(buffered.getvalue()).decode()
-    return f"data:image/png;base64,{img_str}"
+    return buffered.getvalue()
 
-def generate_documentation(transcript, frames):
-    """Generate final documentation with Gemini using delimiters"""
-    try:
-        with st.spinner("🤖 Generating professional documentation... This may take 1-2 minutes..."):
-            content_parts = []
-            
-            instructions = """
+def image_to_gemini_jpeg(image):
+    """Downscale a frame and encode it as JPEG for upload to Gemini"""
+    img = image.copy()
+    img.thumbnail((GEMINI_IMAGE_MAX_SIDE, GEMINI_IMAGE_MAX_SIDE), Image.LANCZOS)
+    buffered = io.BytesIO()
+    img.convert("RGB").save(buffered, format="JPEG", quality=82)
+    return buffered.getvalue()
+
+# Instructions for the SOP generation prompt; {transcript} is filled in per request.
+# This prefix is well under Gemini's minimum size for explicit context caching, and the
+# pinned SDK predates genai.caching, so it is sent inline
+SOP_INSTRUCTIONS = """
 You are an expert technical writer specializing in accounting and finance process documentation.
 
 I will provide you with:
@@ -635,22 +734,102 @@ TRANSCRIPT:
 
 SCREENSHOTS TO INCLUDE:
 """
-            
-            content_parts.append(instructions)
+
+# Cached drafts expire after an hour, and at most this many are kept per server process
+GENERATION_CACHE_TTL = 3600
+GENERATION_CACHE_MAX_ENTRIES = 100
+
+@st.cache_resource
+def get_draft_cache():
+    """Process-wide store of finished drafts: key -> (stored_at, text), oldest first.
+
+    Only final text is kept; the live preview is rendered by stream_draft, outside
+    any Streamlit cache, so nothing is replayed on a hit.
+    """
+    return threading.Lock(), OrderedDict()
+
+def draft_cache_key(model_name, content_parts):
+    """Digest of the model name and every prompt part (text and image bytes)"""
+    digest = hashlib.blake2b(model_name.encode(), digest_size=16)
+    for part in content_parts:
+        data = part['data'] if isinstance(part, dict) else part.encode()
+        # Length prefix so adjacent parts can't run together into the same byte stream
+        digest.update(len(data).to_bytes(8, 'big'))
+        digest.update(data)
+    return digest.hexdigest()
+
+def get_cached_draft(key):
+    """Return the stored draft for key, or None if missing or expired"""
+    lock, drafts = get_draft_cache()
+    with lock:
+        entry = drafts.get(key)
+        if entry is None:
+            return None
+        stored_at, draft = entry
+        if time.monotonic() - stored_at > GENERATION_CACHE_TTL:
+            del drafts[key]
+            return None
+        return draft
+
+def store_draft(key, draft):
+    """Store a finished draft, evicting the oldest entries beyond the size limit"""
+    lock, drafts = get_draft_cache()
+    with lock:
+        drafts[key] = (time.monotonic(), draft)
+        drafts.move_to_end(key)
+        while len(drafts) > GENERATION_CACHE_MAX_ENTRIES:
+            drafts.popitem(last=False)
+
+def stream_draft(model, content_parts):
+    """Stream a draft from Gemini into a live preview and return the full text"""
+    # Stream the response so the draft appears as soon as the first tokens arrive
+    placeholder = st.empty()
+    buf = []
+    for chunk in call_gemini(model, list(content_parts), stream=True):
+        buf.append(chunk.text)
+        placeholder.markdown(''.join(buf))
+    return ''.join(buf)
+
+def generate_documentation(model, transcript, frames):
+    """Generate final documentation with Gemini using delimiters"""
+    try:
+        with st.spinner("🤖 Generating professional documentation... This may take 1-2 minutes..."):
+            content_parts = [SOP_INSTRUCTIONS.format(transcript=transcript)]
             
             # Add screenshot context
+            seen_images = {}  # image hash -> number of the screenshot that first sent it
             for i, frame_data in enumerate(frames, 1):
                 moment = frame_data['moment']
                 screenshot_info = f"Screenshot {i} [{moment['timestamp']}]: {moment['description']}"
                 if moment.get('navigation_path'):
                     screenshot_info += f" | Navigation: {moment['navigation_path']}"
+                
+                # Identical frames are uploaded once; later copies reference the first by number
+                image_hash = hashlib.blake2b(frame_data['gemini_bytes'], digest_size=16).digest()
+                if image_hash in seen_images:
+                    content_parts.append(f"{screenshot_info} | Same image as Screenshot {seen_images[image_hash]}")
+                    continue
+                seen_images[image_hash] = i
+                
                 content_parts.append(screenshot_info)
-                content_parts.append(frame_data['image'])
-            
-            # Generate documentation
-            response = model.generate_content(content_parts)
+                # Downscaled JPEG: a single 768px image tile instead of several full-resolution PNG tiles
+                content_parts.append({
+                    "mime_type": "image/jpeg",
+                    "data": frame_data['gemini_bytes']
+                })
             
-            return response.text
+            # Generate documentation synchronously: the user is waiting on the spinner,
+            # and the pinned google-generativeai SDK has no Batch API (batch jobs can
+            # also take hours to complete), so the Standard tier is the right fit here
+            # Repeat clicks with the same model and inputs reuse the finished draft
+            key = draft_cache_key(model.model_name, content_parts)
+            draft = get_cached_draft(key)
+            if draft is None:
+                draft = stream_draft(model, content_parts)
+                store_draft(key, draft)
+            else:
+                st.markdown(draft)
+            return draft
             
     except Exception as e:
         st.error(f"Error generating documentation: {str(e)}")
@@ -677,10 +856,7 @@ def add_screenshot(doc, screenshot_num, frames):
         frame_data = frames[screenshot_num - 1]
         
         # Add image
-        img_buffer = io.BytesIO()
-        frame_data['image'].save(img_buffer, format='PNG')
-        img_buffer.seek(0)
-        doc.add_picture(img_buffer, width=Inches(6))
+        doc.add_picture(io.BytesIO(frame_data['image_bytes']), width=Inches(6))
         
         # Add caption
         caption = doc.add_paragraph()
@@ -968,15 +1144,22 @@ def show_image_viewer(frames):
         return
     
     current_frame = frames[current_index]
+    moment = current_frame['moment']
+    
+    # Moments to update on edit: the frame passed in, plus the session copy if it is a different list
+    session_frames = st.session_state.extracted_frames
+    edited_moments = [moment]
+    if session_frames and session_frames is not frames:
+        edited_moments.append(session_frames[current_index]['moment'])
     
     # Initialize editing state for this frame if not exists
     edit_key_prefix = f"edit_frame_{current_index}"
-    if f"{edit_key_prefix}_description" not in st.session_state:
-        st.session_state[f"{edit_key_prefix}_description"] = current_frame['moment']['description']
-    if f"{edit_key_prefix}_type" not in st.session_state:
-        st.session_state[f"{edit_key_prefix}_type"] = current_frame['moment']['type']
-    if f"{edit_key_prefix}_nav_path" not in st.session_state:
-        st.session_state[f"{edit_key_prefix}_nav_path"] = current_frame['moment'].get('navigation_path', '')
+    description_key = f"{edit_key_prefix}_description"
+    type_key = f"{edit_key_prefix}_type"
+    nav_path_key = f"{edit_key_prefix}_nav_path"
+    st.session_state.setdefault(description_key, moment['description'])
+    st.session_state.setdefault(type_key, moment['type'])
+    st.session_state.setdefault(nav_path_key, moment.get('navigation_path', ''))
     
     # Create the viewer container
     st.markdown("""
@@ -1011,7 +1194,7 @@ def show_image_viewer(frames):
     # Display full-size image - centered and slightly larger (550px)
     col_left, col_img, col_right = st.columns([1, 2, 1])
     with col_img:
-        st.image(current_frame['image'], width=550)
+        st.image(current_frame['image_bytes'], width=550)
     
     # Editable Image details
     st.markdown("---")
@@ -1025,58 +1208,57 @@ def show_image_viewer(frames):
         
         # Editable Type
         type_options = ['navigation', 'action', 'data_entry', 'decision', 'submission']
+        current_type = st.session_state[type_key]
         new_type = st.selectbox(
             "📍 Type:",
             options=type_options,
-            index=type_options.index(st.session_state[f"{edit_key_prefix}_type"]) if st.session_state[f"{edit_key_prefix}_type"] in type_options else 0,
+            index=type_options.index(current_type) if current_type in type_options else 0,
             key=f"{edit_key_prefix}_type_input"
         )
         
         # Update session state
-        if new_type != st.session_state[f"{edit_key_prefix}_type"]:
-            st.session_state[f"{edit_key_prefix}_type"] = new_type
+        if new_type != current_type:
+            st.session_state[type_key] = new_type
             # Update the frame data in both frames parameter and session state
-            frames[current_index]['moment']['type'] = new_type
-            if st.session_state.extracted_frames:
-                st.session_state.extracted_frames[current_index]['moment']['type'] = new_type
+            for edited_moment in edited_moments:
+                edited_moment['type'] = new_type
     
     with col2:
         # Editable Description
+        current_description = st.session_state[description_key]
         new_description = st.text_area(
             "📝 Description:",
-            value=st.session_state[f"{edit_key_prefix}_description"],
+            value=current_description,
             height=100,
             key=f"{edit_key_prefix}_description_input"
         )
         
         # Update session state and frame data
-        if new_description != st.session_state[f"{edit_key_prefix}_description"]:
-            st.session_state[f"{edit_key_prefix}_description"] = new_description
-            frames[current_index]['moment']['description'] = new_description
-            if st.session_state.extracted_frames:
-                st.session_state.extracted_frames[current_index]['moment']['description'] = new_description
+        if new_description != current_description:
+            st.session_state[description_key] = new_description
+            for edited_moment in edited_moments:
+                edited_moment['description'] = new_description
         
         # Navigation path (if type is navigation)
         if new_type == 'navigation':
+            current_nav_path = st.session_state[nav_path_key]
             new_nav_path = st.text_input(
                 "🧭 Navigation Path:",
-                value=st.session_state[f"{edit_key_prefix}_nav_path"],
+                value=current_nav_path,
                 key=f"{edit_key_prefix}_nav_input",
                 placeholder="Menu > Options > Add Account"
             )
-            if new_nav_path != st.session_state[f"{edit_key_prefix}_nav_path"]:
-                st.session_state[f"{edit_key_prefix}_nav_path"] = new_nav_path
-                frames[current_index]['moment']['navigation_path'] = new_nav_path
-                if st.session_state.extracted_frames:
-                    st.session_state.extracted_frames[current_index]['moment']['navigation_path'] = new_nav_path
-        elif current_frame['moment'].get('navigation_path'):
-            st.markdown(f"**🧭 Navigation:** `{current_frame['moment']['navigation_path']}`")
+            if new_nav_path != current_nav_path:
+                st.session_state[nav_path_key] = new_nav_path
+                for edited_moment in edited_moments:
+                    edited_moment['navigation_path'] = new_nav_path
+        elif moment.get('navigation_path'):
+            st.markdown(f"**🧭 Navigation:** `{moment['navigation_path']}`")
     
     # Save changes button
     if st.button("💾 Save Changes", key=f"save_{current_index}", type="primary"):
-        # Changes are already saved to frames, just show confirmation
+        # Changes are already saved to frames, just show confirmation (no rerun needed)
         st.success("✅ Changes saved! They will be included in the generated documentation.")
-        st.rerun()
 
 def show_moment_editor(key_moments):
     """Show interactive editor for key moments"""
@@ -1237,6 +1419,21 @@ def show_moment_editor(key_moments):
 # test
 def main():
     initialize_session_state()
+    inject_css()
+    
+    # Model choice comes first so every Gemini call in this run uses it; the handle itself is
+    # only built where Gemini is called, so first paint never loads the SDK
+    model_options = list(GEMINI_MODELS)
+    if DEFAULT_GEMINI_MODEL not in model_options:
+        model_options.append(DEFAULT_GEMINI_MODEL)
+    with st.sidebar:
+        model_name = st.selectbox(
+            "AI model",
+            options=model_options,
+            index=model_options.index(DEFAULT_GEMINI_MODEL),
+            format_func=lambda name: GEMINI_MODELS.get(name, name),
+            help="Flash is faster and cheaper; switch to Pro for long or complex processes."
+        )
     
     # Logo with link to homepage - positioned at top left using columns
     # Check for local logo first, otherwise use URL
@@ -1245,16 +1442,8 @@ def main():
     col_logo, col_spacer = st.columns([1, 11])
     with col_logo:
         if os.path.exists(logo_path):
-            # Use local file - convert to base64 for embedding
-            with open(logo_path, "rb") as img_file:
-                img_data = base64.b64encode(img_file.read()).decode()
-                st.markdown(f"""
-                <div style="padding: 10px 0;">
-                    <a href="https://mmautomates.com" target="_self" style="text-decoration: none; display: inline-block;">
-                        <img src="data:image/png;base64,{img_data}" alt="MM Automates" style="height: 96px; width: 96px; object-fit: contain; cursor: pointer;">
-                    </a>
-                </div>
-                """, unsafe_allow_html=True)
+            # Use local file - embedded as base64 (encoded once per process, not per rerun)
+            st.markdown(get_logo_html(logo_path), unsafe_allow_html=True)
         else:
             # Fallback to URL
             st.markdown("""
@@ -1274,7 +1463,7 @@ def main():
     """, unsafe_allow_html=True)
     
     # API Key Setup
-    if not model:
+    if 'GEMINI_API_KEY' not in os.environ:
         st.error("""
         **⚠️ Setup Required**: Gemini API key not configured.
         
@@ -1428,14 +1617,15 @@ def main():
                     st.success(f"✅ Audio extracted successfully! Video duration: {duration:.1f} seconds")
                     
                     # Transcribe audio
-                    transcript = transcribe_audio_with_gemini(audio_path)
+                    model = get_model(model_name)
+                    transcript = transcribe_audio_with_gemini(model, audio_path)
                     
                     if transcript:
                         st.session_state.transcript = transcript
                         st.success("✅ Transcription complete!")
                         
                         # Analyze transcript
-                        key_moments = analyze_transcript_for_key_moments(transcript)
+                        key_moments = analyze_transcript_for_key_moments(model, transcript)
                         
                         if key_moments:
                             st.session_state.key_moments = key_moments
@@ -1519,25 +1709,26 @@ def main():
         st.markdown("---")
         st.markdown("### Step 4: Review Extracted Screenshots")
         
-        st.success(f"✅ {len(st.session_state.extracted_frames)} screenshots ready")
+        # Read the frames list from session state once for the whole grid
+        frames = st.session_state.extracted_frames
+        
+        st.success(f"✅ {len(frames)} screenshots ready")
         
         # Display frames in grid with click to view
         cols_per_row = 3
-        for i in range(0, len(st.session_state.extracted_frames), cols_per_row):
-            cols = st.columns(cols_per_row)
-            for j in range(cols_per_row):
-                if i + j < len(st.session_state.extracted_frames):
-                    frame_data = st.session_state.extracted_frames[i + j]
-                    frame_index = i + j
-                    with cols[j]:
-                        # Show thumbnail
-                        st.image(frame_data['image'], caption=f"{frame_data['timestamp']} - {frame_data['moment']['type']}")
-                        st.caption(frame_data['moment']['description'][:100] + "...")
-                        
-                        # View button
-                        if st.button("🔍 View Full Size", key=f"view_{frame_index}"):
-                            st.session_state.viewing_image = frame_index
-                            st.rerun()
+        for frame_index, frame_data in enumerate(frames):
+            if frame_index % cols_per_row == 0:
+                cols = st.columns(cols_per_row)
+            with cols[frame_index % cols_per_row]:
+                # Show thumbnail - the 768px JPEG already made for Gemini is plenty for a grid
+                # cell and far smaller than the full PNG, which is kept for the viewer and export
+                st.image(frame_data['gemini_bytes'], caption=f"{frame_data['timestamp']} - {frame_data['moment']['type']}")
+                st.caption(frame_data['moment']['description'][:100] + "...")
+                
+                # View button
+                if st.button("🔍 View Full Size", key=f"view_{frame_index}"):
+                    st.session_state.viewing_image = frame_index
+                    st.rerun()
         
         # Generate documentation button
         st.markdown("---")
@@ -1546,6 +1737,7 @@ def main():
             if st.button("Generate Professional Documentation", type="primary"):
                 # Generate documentation using delimiters
                 doc_content = generate_documentation(
+                    get_model(model_name),
                     st.session_state.transcript,
                     st.session_state.extracted_frames
                 )
@@ -1560,6 +1752,7 @@ def main():
                     
                     if word_doc:
                         st.session_state.word_doc_bytes = word_doc
+                        st.session_state.word_doc_created_at = datetime.now()
                         st.success("✅ Documentation generated and ready to download!")
                         st.rerun()
         else:
@@ -1570,11 +1763,12 @@ def main():
         st.markdown("---")
         st.markdown("### Step 5: Download Your Professional Documentation")
         
-        # Download Word document (single column)
+        # Download Word document (single column); name is fixed at generation time, not per rerun
+        created_at = st.session_state.word_doc_created_at or datetime.now()
         st.download_button(
             label="📥 Download Word Document (.docx)",
             data=st.session_state.word_doc_bytes,
-            file_name=f"process_documentation_{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx",
+            file_name=f"process_documentation_{created_at.strftime('%Y%m%d_%H%M%S')}.docx",
             mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
             type="primary"
         )
@@ -1713,7 +1907,7 @@ def main():
             - Python 3.11
             
             **AI:**
-            - Google Gemini-2.5 Pro API
+            - Google Gemini API (2.5 Flash by default, 2.5 Pro when selected)
             
             **Video & Image Processing:**
             - MoviePy 1.0+
@@ -1780,7 +1974,7 @@ def main():
             - Data transmission to Google Drive is encrypted via HTTPS
             
             **Gemini API Processing:**
-            - Audio recordings, transcripts, and screenshots are sent to Google's Gemini 2.5 Pro API for processing
+            - Audio recordings, transcripts, and screenshots are sent to Google's Gemini API (2.5 Flash by default, 2.5 Pro when selected) for processing
             - All data transmission is encrypted via HTTPS
             - Processing is performed on Google's servers (third-party service)
             - Data handling is subject to [Google's Gemini API terms for paid services](https://ai.google.dev/gemini-api/terms#paid-services)